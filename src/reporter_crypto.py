@@ -2,13 +2,16 @@
     the best or worst by percentage increase in the last 24 hours, the percentage gain or loss on a hypothetical investment. 
     The information is retrieved from the CoinMarketCap platform.
 """
-import json
-import os
 import time
 import datetime
+import heapq
+import itertools
+import operator
 import sys
+import threading
 from abc import ABC, abstractmethod
 from pathlib import Path
+import orjson
 import requests
 import yaml
 import schedule
@@ -59,14 +62,16 @@ class LoadConfiguration:
     def __init__(self):
         """Constructor of singleton LoadConfiguration class.
 
-        Load configuration from yaml configuration file contained in res directory.
+        Load configuration from yaml configuration file contained in res directory,
+        with the libyaml safe loader when available, and reads once the configuration parameters.
         """
         self._path_file = Path(__file__).resolve(
         ).parent.parent / self._NAME_OF_FILE
         try:
             with open(self._path_file, encoding='utf-8',
                       mode='r') as configuration_file:
-                self._config = yaml.safe_load(configuration_file)
+                self._config = yaml.load(
+                    configuration_file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
         except FileNotFoundError as ex:
             print(
                 ex,
@@ -80,18 +85,31 @@ class LoadConfiguration:
                 "Permission denied, please give permission to app and run it again"
             )
             sys.exit(1)
+        self._api_url = self._config.get("API-URL")
+        self._api_key = self._config.get("API-KEY")
+        self._api_params = {
+            key: value
+            for param in self._config.get("API-PARAMS")
+            for key, value in param.items()
+        }
+        self._max_threshold = self._config.get('MAX-THRESHOLD-VOLUME', 76000000)
+        self._ranking_crypto = self._config.get('RANKING_CRYPTO', 10)
+        self._num_crypto = self._config.get('NUM_CRYPTO', 20)
+        self._time = self._config.get('TIME', '16:30')
+        self._repeat_interval = self._config.get('REPEAT_INTERVAL', 'day')
+        self._cache_ttl = self._config.get('CACHE_TTL_SECONDS', 300)
 
     @property
     def get_api_url(self):
         """URL to make the get request.
         """
-        return self._config.get("API-URL")
+        return self._api_url
 
     @property
     def get_api_key(self):
         """API key for make the request.
         """
-        return self._config.get("API-KEY")
+        return self._api_key
 
     @property
     def get_api_params(self):
@@ -100,10 +118,7 @@ class LoadConfiguration:
         Returns:
             dict : the parameters to pass to the request.
         """
-        params = {}
-        for param in self._config.get("API-PARAMS"):
-            params.update(param)
-        return params
+        return self._api_params
 
     @property
     def get_max_threshold(self):
@@ -113,7 +128,7 @@ class LoadConfiguration:
         Returns:
             int : the maximum threshold.
         """
-        return self._config.get('MAX-THRESHOLD-VOLUME', 76000000)
+        return self._max_threshold
 
     @property
     def get_ranking_crypto(self):
@@ -122,7 +137,7 @@ class LoadConfiguration:
         Returns:
             int : the number of cryptos to be ranked.
         """
-        return self._config.get('RANKING_CRYPTO', 10)
+        return self._ranking_crypto
 
     @property
     def get_num_crypto(self):
@@ -131,7 +146,7 @@ class LoadConfiguration:
         Returns:
             int: number of the cryptos.
         """
-        return self._config.get('NUM_CRYPTO', 20)
+        return self._num_crypto
 
     @property
     def get_time(self):
@@ -140,7 +155,7 @@ class LoadConfiguration:
         Returns:
             str : time to make the report.
         """
-        return self._config.get('TIME', '16:30')
+        return self._time
 
     @property
     def get_repeat_interval(self):
@@ -149,14 +164,23 @@ class LoadConfiguration:
         Returns:
             str: the way of execution of module.
         """
-        return self._config.get('REPEAT_INTERVAL', 'day')
+        return self._repeat_interval
+
+    @property
+    def get_cache_ttl(self):
+        """Property representing how many seconds a response of the api is reused before a new request.
+
+        Returns:
+            int: the time to live of the cached response, in seconds.
+        """
+        return self._cache_ttl
 
 
 class Subject(ABC):
     """ The Subject interface declares a set of methods for managing subscribers.
 
         Attributes:
-            self._observers: set, set of observers subscribed to the subject
+            self._observers: list, list of observers subscribed to the subject, in order of subscription
 
     """
     @abstractmethod
@@ -184,47 +208,121 @@ class Subject(ABC):
 class CoinMarketCapApi(Subject):
     """The class make the request to the endpoint specified in the yaml file. 
         If the request gets a successful response then it alerts the observers.
+        Successful responses are cached for the time to live set in the yaml file,
+        so the runs within that interval don't make a new request.
+        The requests share one http session, so the connection is reused between runs.
+        When the api returns an ETag, the next request is conditional and a
+        304 Not Modified response reuses the data of the previous one.
 
     Args:
-        self._observers: set of observers for Observer design pattern.
+        self._observers: list of observers for Observer design pattern.
         self._api_url: url for make the request.
         self._api_key: the key of api.
         self._headers: the header of the request.
+        self._session: the http session, with the header of the request.
         self._params: the params to pass to the request.
+        self._cache_ttl: the seconds a cached response is considered fresh.
+        self._etag: the ETag of the last successful response, None if missing.
+        self._etag_data: the data of the last successful response.
     """
 
+    _cache = {}
+    _cache_lock = threading.Lock()
+
     def __init__(self) -> None:
-        self._observers: "set[Observer]" = set()
-        self._api_url = LoadConfiguration().get_api_url
-        self._api_key = LoadConfiguration().get_api_key
+        self._observers: "list[Observer]" = []
+        configuration = LoadConfiguration()
+        self._api_url = configuration.get_api_url
+        self._api_key = configuration.get_api_key
         self._headers = {
             'Accepts': 'application/json',
             'X-CMC_PRO_API_KEY': self._api_key
         }
-        self._params = LoadConfiguration().get_api_params
+        self._session = requests.Session()
+        self._session.headers.update(self._headers)
+        self._params = configuration.get_api_params
+        self._cache_ttl = configuration.get_cache_ttl
+        self._etag = None
+        self._etag_data = None
+
+    def _cache_key(self):
+        """The key of the cached response for the current url and params.
+        """
+        return (self._api_url, frozenset(self._params.items()))
+
+    def _get_cached(self):
+        """Gets the cached data of the response if it is still fresh.
+
+        Returns:
+            list: the data of the cached response, None if missing or expired.
+        """
+        with self._cache_lock:
+            cached = self._cache.get(self._cache_key())
+        if cached is None:
+            return None
+        timestamp, data = cached
+        if time.monotonic() - timestamp >= self._cache_ttl:
+            return None
+        return data
+
+    def _set_cached(self, data):
+        """Caches the data of the response with the current time.
+        """
+        with self._cache_lock:
+            self._cache[self._cache_key()] = (time.monotonic(), data)
+
+    def _invalidate_cached(self):
+        """Removes the cached response for the current url and params.
+        """
+        with self._cache_lock:
+            self._cache.pop(self._cache_key(), None)
 
     def get_crypt_info(self):
         """Get request to CoinMarketCap.
         """
+        data = self._get_cached()
+        if data is not None:
+            self.notify(data)
+            return
+        headers = None
+        if self._etag is not None:
+            headers = {'If-None-Match': self._etag}
         try:
-            response = requests.get(
-                url=self._api_url, headers=self._headers, params=self._params, timeout=10).json()
+            http_response = self._session.get(
+                url=self._api_url, params=self._params, headers=headers, timeout=10)
+            if http_response.status_code == 304:
+                self._set_cached(self._etag_data)
+                self.notify(self._etag_data)
+                return
+            response = orjson.loads(http_response.content)
             if response['status']['error_code'] == 0:
+                self._etag = http_response.headers.get('ETag')
+                self._etag_data = response['data']
+                self._set_cached(response['data'])
                 self.notify(response['data'])
             else:
+                self._invalidate_cached()
                 print(
-                    f"{response['status']['error_code']: {response['status']['error_message']}}")
+                    f"{response['status']['error_code']}: {response['status']['error_message']}")
         except requests.exceptions.HTTPError as errh:
+            self._invalidate_cached()
             print("HTTP Error")
         except requests.exceptions.ReadTimeout as errrt:
+            self._invalidate_cached()
             print("Time out")
         except requests.exceptions.ConnectionError as conerr:
+            self._invalidate_cached()
             print("Connection error")
         except requests.exceptions.RequestException as errex:
+            self._invalidate_cached()
             print("Exception request")
+        except orjson.JSONDecodeError as errjson:
+            self._invalidate_cached()
+            print("Invalid response")
 
     def subscribe(self, observer):
-        self._observers.add(observer)
+        if observer not in self._observers:
+            self._observers.append(observer)
 
     def unsubscribe(self, observer):
         if observer in self._observers:
@@ -248,22 +346,32 @@ class CryptoInfoDetector(Observer):
             8. Cryptocurrencies ranked by chronological order of addition to CoinMarketCap platform.
     Args:
         self._converter: the currency of the crypto information.
-        self._api_response: the data of response of http request.
+        self._names, self._symbols: the name and the symbol of each crypto in the response.
+        self._quotes: the quote in the currency of converter of each crypto in the response.
+        self._prices, self._volumes_24h, self._market_caps: the fields of the quotes.
+        self._price_totals: the prefix sums of the first prices, up to the largest number of cryptos in the report.
+        self._circulating_supplies, self._dates_added: the fields of the cryptos in the response.
+        self._percent_changes: the percentage changes of the quotes, by time interval.
         self._max_threshold: the maximum threshold.
         self._ranking_crypto: the number of cryptos to be ranked.
         self._logger: instance of Logger class.
     """
 
+    _RESPONSE_FIELDS = operator.itemgetter(
+        'name', 'symbol', 'circulating_supply', 'date_added', 'quote')
+    _QUOTE_FIELDS = operator.itemgetter('price', 'volume_24h', 'market_cap')
+
     def __init__(self) -> None:
-        self._converter = LoadConfiguration().get_api_params.get('convert')
-        self._api_responses = {}
-        self._max_threshold = LoadConfiguration().get_max_threshold
-        self._ranking_crypto = LoadConfiguration().get_ranking_crypto
-        self._num_crypto = LoadConfiguration().get_num_crypto
+        configuration = LoadConfiguration()
+        self._converter = configuration.get_api_params.get('convert')
+        self._extract_fields([])
+        self._max_threshold = configuration.get_max_threshold
+        self._ranking_crypto = configuration.get_ranking_crypto
+        self._num_crypto = configuration.get_num_crypto
         self._logger = ReportWriter()
 
     def notify(self, message) -> None:
-        self._api_responses = message
+        self._extract_fields(message)
         percent_change = "7d"
         crypto_info = [
             ("max_volume_24h:", self.get_max_volume_24h()),
@@ -284,22 +392,59 @@ class CryptoInfoDetector(Observer):
         ]
         self._logger.write_report(dict(crypto_info))
 
+    def _extract_fields(self, message):
+        """Extracts in a single pass the fields of the response into a list for each field.
+
+        Args:
+            message (list): the data of response of http request.
+        """
+        self._names = []
+        self._symbols = []
+        self._quotes = []
+        self._prices = []
+        self._volumes_24h = []
+        self._market_caps = []
+        self._circulating_supplies = []
+        self._dates_added = []
+        self._percent_changes = {}
+        converter = self._converter
+        for response in message:
+            name, symbol, circulating_supply, date_added, quotes = self._RESPONSE_FIELDS(response)
+            quote = quotes[converter]
+            price, volume_24h, market_cap = self._QUOTE_FIELDS(quote)
+            self._names.append(name)
+            self._symbols.append(symbol)
+            self._circulating_supplies.append(circulating_supply)
+            self._dates_added.append(date_added)
+            self._quotes.append(quote)
+            self._prices.append(price)
+            self._volumes_24h.append(volume_24h)
+            self._market_caps.append(market_cap)
+        self._price_totals = list(itertools.accumulate(self._prices[:max(self._num_crypto, 30)]))
+
+    def _get_percent_changes(self, time_percentage: str):
+        """Gets the percentage changes of the quotes in the time interval, extracting them on first use.
+
+        Args:
+            time_percentage (str): the time interval of the percentage change.
+
+        Returns:
+            list: the percentage change of each crypto in the response.
+        """
+        if time_percentage not in self._percent_changes:
+            field = operator.itemgetter(f'percent_change_{time_percentage}')
+            self._percent_changes[time_percentage] = list(map(field, self._quotes))
+        return self._percent_changes[time_percentage]
+
     def get_max_volume_24h(self):
         """Gets the cryptocurrency with the highest volume (in $) in the last 24 hours
 
         Returns:
             str: The cryptocurrency with the highest volume (in $) in the last 24 hours
         """
-        max_volume = 0
-        index_max_volume = 0
-        for index, mex in enumerate(self._api_responses):
-            volume = mex.get('quote').get(self._converter).get('volume_24h')
-
-            if volume > max_volume:
-                max_volume = volume
-                index_max_volume = index
-
-        return f"{self._api_responses[index_max_volume].get('name')} {max_volume}$"
+        index_max_volume = max(
+            range(len(self._volumes_24h)), key=self._volumes_24h.__getitem__)
+        return f"{self._names[index_max_volume]} {self._volumes_24h[index_max_volume]}$"
 
     def get_amount_money(self, num_crypto: int = 0):
         """Gets the amount of money needed to purchase one unit of each of the top of the specified number of cryptocurrencies.
@@ -312,11 +457,9 @@ class CryptoInfoDetector(Observer):
         """
         if num_crypto == 0:
             num_crypto = self._num_crypto
-        prices = [
-            response.get('quote').get(self._converter).get('price')
-            for response in self._api_responses[:num_crypto]
-        ]
-        amount_total = sum(prices)
+        if 0 < num_crypto <= len(self._price_totals):
+            return self._price_totals[num_crypto - 1]
+        amount_total = sum(self._prices[:num_crypto])
         return amount_total
 
     def get_info_about_percent_change(self, reverse: bool = False, time_percentage: str = '24h'):
@@ -329,12 +472,7 @@ class CryptoInfoDetector(Observer):
         Returns:
             list: gets cryptocurrencies ranked by percentage change.
         """
-        percents = (
-            (f"{api_response.get('name')} {api_response.get('symbol')}: {api_response.get('quote').get(self._converter).get(f'percent_change_{time_percentage}')}")
-            for api_response in self._api_responses
-        )
-        percents = sorted(percents, key=lambda perc: perc[1], reverse=reverse)
-        return percents[:self._ranking_crypto]
+        return self._get_ranking(self._get_percent_changes(time_percentage), reverse)
 
     def get_amount_money_threshold_last_24h(self):
         """Gets the amount of money needed to buy one unit of all cryptocurrencies whose volume in the last 24 hours is more than $76,000,000.
@@ -342,11 +480,9 @@ class CryptoInfoDetector(Observer):
         Returns:
             float: the amount of money needed to buy one unit of all cryptocurrencies whose volume in the last 24 hours is more than $76,000,000.
         """
-        amount = sum(
-            response.get('quote').get(self._converter).get('price')
-            for response in self._api_responses
-            if response.get('quote').get(self._converter).get('volume_24h') > self._max_threshold
-        )
+        over_threshold = map(
+            operator.gt, self._volumes_24h, itertools.repeat(self._max_threshold))
+        amount = sum(itertools.compress(self._prices, over_threshold))
         return amount
 
     def get_info_investment(self):
@@ -355,17 +491,12 @@ class CryptoInfoDetector(Observer):
         Returns:
             float: the earn percent.
         """
-        prices = []
-        purchase_prices = []
-        for response in self._api_responses[:self._num_crypto]:
-            price = response.get('quote').get(self._converter).get('price')
-            increment = response.get('quote').get(
-                self._converter).get('percent_change_24h')
-            purchase_price = price - (price * (increment / 100))
-            prices.append(price)
-            purchase_prices.append(purchase_price)
-
-        total_purchase = sum(purchase_prices)
+        prices = self._prices[:self._num_crypto]
+        increments = self._get_percent_changes('24h')
+        total_purchase = sum(
+            price * (1 - increment / 100)
+            for price, increment in zip(prices, increments)
+        )
         earn = (sum(prices) - total_purchase) / total_purchase
         earn_percent = earn * 100
         return earn_percent
@@ -380,13 +511,7 @@ class CryptoInfoDetector(Observer):
         Returns:
             list: the cryptocurrencies classified by circulating supply.
         """
-        circulating_supplys = (
-            (f"{response.get('name')} {response.get('symbol')}: {response.get('circulating_supply')}")
-            for response in self._api_responses
-        )
-        circulating_supplys = sorted(
-            circulating_supplys, key=lambda c_supply: c_supply[1], reverse=order)
-        return circulating_supplys
+        return self._get_ranking(self._circulating_supplies, order)
 
     def get_market_capitalization(self, order: bool = False):
         """Gets cryptocurrencies classified by market cap.
@@ -398,13 +523,7 @@ class CryptoInfoDetector(Observer):
         Returns:
             list: the cryptocurrencies classified by market cap.
         """
-        market_caps = (
-            (f"{response.get('name')} {response.get('symbol')}: {response.get('quote').get(self._converter).get('market_cap')}")
-            for response in self._api_responses
-        )
-        market_caps = sorted(
-            market_caps, key=lambda cap: cap[1], reverse=order)
-        return market_caps
+        return self._get_ranking(self._market_caps, order)
 
     def get_date_added_ranking(self, order: bool = False):
         """Gets cryptocurrencies ranked by chronological order of addition to CoinMarketCap platform.
@@ -416,25 +535,50 @@ class CryptoInfoDetector(Observer):
         Returns:
             list: the cryptocurrencies ranked by chronological order of addition to CoinMarketCap platform.
         """
-        dates = (
-            (f"{response.get('name')} {response.get('symbol')}: {response.get('date_added')}")
-            for response in self._api_responses
+        return self._get_ranking(self._dates_added, order)
+
+    def _get_ranking(self, values, reverse: bool):
+        """Gets the cryptocurrencies ranked by the value of each crypto.
+
+        Only the first cryptocurrencies of the ranking are formatted, the ones without a value are skipped.
+
+        Args:
+            values (list): the value to rank of each crypto in the response.
+            reverse (bool): Indicates whether to run a ranking of best or worst.
+
+        Returns:
+            list: the ranked cryptocurrencies as "name symbol: value".
+        """
+        indexes = (
+            index
+            for index, value in enumerate(values)
+            if value is not None
         )
-        dates = sorted(dates, key=lambda cap: cap[1], reverse=order)
-        return dates
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        ranking = select(self._ranking_crypto, indexes, key=values.__getitem__)
+        return [
+            f"{self._names[index]} {self._symbols[index]}: {values[index]}"
+            for index in ranking
+        ]
 
 
 class IReportCryptoLayer:
     """Interface to use the module reporter crypto.
+
+        Args:
+            self._retrieve (CoinMarketCapApi): the instance of CoinMarketCapApi, reused by every run.
+            self._parser (CryptoInfoDetector): the instance of CryptoInfoDetector subscribed to retrieve.
     """
 
+    def __init__(self) -> None:
+        self._retrieve = CoinMarketCapApi()
+        self._parser = CryptoInfoDetector()
+        self._retrieve.subscribe(self._parser)
+
     def main(self):
         """The main of the application.
         """
-        retrieve = CoinMarketCapApi()
-        parser = CryptoInfoDetector()
-        retrieve.subscribe(parser)
-        retrieve.get_crypt_info()
+        self._retrieve.get_crypt_info()
 
 
 class Scheduler:
@@ -446,9 +590,12 @@ class Scheduler:
             self._report_crypto (IReportCryptoLayer): the instance of IReportCryptoLayer.
     """
 
+    _MAX_SLEEP_SECONDS = 60
+
     def __init__(self) -> None:
-        self._time = LoadConfiguration().get_time
-        self._repeat_interval = LoadConfiguration().get_repeat_interval
+        configuration = LoadConfiguration()
+        self._time = configuration.get_time
+        self._repeat_interval = configuration.get_repeat_interval
         self. _report_crypto = IReportCryptoLayer()
         self.set_schedule()
 
@@ -464,32 +611,49 @@ class Scheduler:
 
     def run(self):
         """It runs the reporting system according to the set scheduling.
+
+        It sleeps until the next scheduled run, at most _MAX_SLEEP_SECONDS at a time so that
+        wall clock changes (daylight saving, suspend) are picked up, and stops when no run is scheduled.
         """
         while True:
+            idle_seconds = schedule.idle_seconds()
+            if idle_seconds is None:
+                break
+            if idle_seconds > 0:
+                time.sleep(min(idle_seconds, self._MAX_SLEEP_SECONDS))
             schedule.run_pending()
-            time.sleep(1)
 
 
+@singleton
 class ReportWriter:
     """This class is responsible for writing the reportable information of cryptocurrencies to the json file.
 
         Args:
-            self.filename: the path of the report json file.
+            self._directory: the path of the report directory.
+            self._filename: the path of the report json file of self._date.
+            self._date: the date of the report json file.
     """
-    _NAME_OF_FILE = Path(f"report/report_{datetime.datetime.now().strftime('%d-%m-%y')}.json")
+    _NAME_OF_DIRECTORY = Path("report")
 
     def __init__(self):
-        self.filename = Path(__file__).resolve(
-        ).parent.parent / self._NAME_OF_FILE
-        project_root = os.path.abspath(
-            os.path.dirname(__file__)).replace("src", "")
-        directory = os.path.join(project_root, 'report')
-        filename = os.path.abspath(os.path.join(directory, 'report.json'))
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        if not os.path.exists(filename):
-            file = open(filename, "x", encoding="utf-8")
-            file.close()
+        self._directory = Path(__file__).resolve(
+        ).parent.parent / self._NAME_OF_DIRECTORY
+        self._filename = None
+        self._date = None
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def filename(self):
+        """The path of the report json file, it changes every day.
+
+        Returns:
+            Path: the path of the report json file of today.
+        """
+        today = datetime.date.today()
+        if today != self._date:
+            self._date = today
+            self._filename = self._directory / f"report_{today:%d-%m-%y}.json"
+        return self._filename
 
     def write_report(self, data):
         """The method writes in the report file the informations.
@@ -498,9 +662,8 @@ class ReportWriter:
             data (dict): the informations about the cryptos.
         """
         print("Writing in the report file...")
-        with open(self.filename, 'a+', encoding='utf-8') as file:
-            json.dump(data, file, indent=4)
-            file.write('\n')
+        with open(self.filename, 'ab') as file:
+            file.write(orjson.dumps(data, option=orjson.OPT_INDENT_2) + b'\n')
 
 
 if __name__ == "__main__":